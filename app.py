@@ -1,18 +1,69 @@
 import base64
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import io
 from datetime import datetime
 import os
-
+import sqlite3
+import threading
+import time
+from typing import Iterator
+import uuid
+
+import boto3
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import BotoCoreError, ClientError
+import diskcache
+import httpx
+import sqlite_vec
 import streamlit as st
 from PIL import Image
+from sentence_transformers import SentenceTransformer
+from streamlit.delta_generator import DeltaGenerator
 from streamlit_javascript import st_javascript
 import openai
 
+from prompts import PROMPT_CACHE_KEY, PROMPT_VERSION, SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
+
 # ---------- App config (must be near the top) ----------
 st.set_page_config(page_title="Green Building Materials Advisor", layout="wide")
 
+# ---------- Response cache ----------
+RESPONSE_CACHE_DIR = "./.llm_cache"
+RESPONSE_CACHE_TTL = 6 * 3600  # seconds
+
+# ---------- OpenAI client ----------
+OPENAI_CLIENT_MAX_ENTRIES = 8  # distinct API keys with a live client
+OPENAI_CLIENT_TTL = 3600  # seconds before a client is rebuilt
+
+
+# ---------- Model tiers ----------
+# Lighter styles go to gpt-4o-mini with a smaller budget; only the detailed styles use gpt-4o.
+STYLE_TIERS = {
+    "Casual": ("gpt-4o-mini", 800),
+    "Normal": ("gpt-4o-mini", 1200),
+    "Informative": ("gpt-4o", 1500),
+    "Formal": ("gpt-4o", 2000),
+}
+
+# ---------- Image detail ----------
+DEFAULT_MAX_SIDE = 1024  # larger uploads are resized to fit before sending
+FAST_MODE_MAX_SIDE = 768  # resize target in fast mode
+LOW_DETAIL_MAX_SIDE = 768  # images up to this size are sent with detail "low"
+PREVIEW_MAX_SIZE = (640, 640)  # on-page preview of the upload
+IMAGE_URL_TTL = 600  # seconds a pre-signed image URL stays valid
+
+# ---------- Semantic cache (near-duplicate images) ----------
+CLIP_MODEL_NAME = "clip-ViT-B-32"
+CLIP_INPUT_SIZE = (448, 448)  # CLIP works at 224px, so a small draft-decoded copy is enough
+SEMANTIC_CACHE_PATH = "./.llm_cache/semantic.sqlite3"
+SEMANTIC_CACHE_TTL = 24 * 3600  # seconds
+SEMANTIC_MAX_DISTANCE = 0.08  # cosine distance below which two images count as the same
+
 
 # ---------- Helpers ----------
+@st.cache_data(ttl=300, show_spinner=False)
 def get_api_key() -> str | None:
     """
     Securely load the OpenAI API key.
@@ -20,6 +71,7 @@ def get_api_key() -> str | None:
       1) st.secrets["openai"]["api_key"]  (Streamlit Cloud Secrets)
       2) environment variable OPENAI_API_KEY
       3) optional user input in the sidebar (handled outside)
+    Cached for 5 minutes so reruns skip the lookup while rotated secrets are still picked up.
     """
     # 1) Streamlit secrets
     try:
@@ -33,59 +85,380 @@ def get_api_key() -> str | None:
     return os.getenv("OPENAI_API_KEY")
 
 
-def encode_image_to_base64(image: Image.Image) -> str:
-    """Convert a PIL Image to a base64 string (JPEG, resized if large)."""
-    max_size = (1024, 1024)
+@st.cache_data(show_spinner=False, max_entries=16)
+def make_preview(file_bytes: bytes) -> Image.Image:
+    """Small copy of the upload for on-page display, so reruns don't re-send the full image."""
+    image = Image.open(io.BytesIO(file_bytes))
+    if image.format == "JPEG":
+        image.draft("RGB", PREVIEW_MAX_SIZE)
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA")
+    image.thumbnail(PREVIEW_MAX_SIZE, Image.Resampling.BILINEAR)
+    return image
+
+
+def has_jpeg_metadata(image: Image.Image) -> bool:
+    """
+    True if a JPEG carries any marker segment beyond JFIF, Adobe colour info and an ICC profile.
+    That covers EXIF and XMP (APP1, where GPS position and device serial live), IPTC/Photoshop
+    (APP13), comments (COM) and anything unrecognised.
+    """
+    for marker, data in image.applist:
+        if marker in ("APP0", "APP14"):
+            continue
+        if marker == "APP2" and data.startswith(b"ICC_PROFILE\0"):
+            continue
+        return True
+    return False
+
+
+# cache_resource hands back the cached bytes object itself; cache_data would unpickle a copy per call.
+@st.cache_resource(show_spinner=False, max_entries=16)
+def prepare_image_jpeg(file_bytes: bytes, max_side: int = DEFAULT_MAX_SIDE) -> bytes:
+    """Convert uploaded image bytes to the JPEG sent to OpenAI (resized to fit `max_side` if large)."""
+    max_size = (max_side, max_side)
+    # Opening only parses the header; pixels are not decoded until needed.
+    image = Image.open(io.BytesIO(file_bytes))
+    # Small RGB/greyscale JPEGs can be sent as uploaded, skipping a decode/encode round trip.
+    # Files carrying metadata (GPS position, device serial, ...) are re-encoded, which strips it.
+    if (
+        image.format == "JPEG"
+        and image.mode in ("RGB", "L")
+        and not has_jpeg_metadata(image)
+        and image.size[0] <= max_size[0]
+        and image.size[1] <= max_size[1]
+    ):
+        return file_bytes
+
+    # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full resolution.
+    if image.format == "JPEG":
+        image.draft("RGB", max_size)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
     if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        image.thumbnail(max_size, Image.Resampling.BICUBIC)
 
     buffer = io.BytesIO()
     image.save(buffer, format="JPEG", quality=85)
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    return img_str
+    # With no buffer views exported, getvalue() hands over the internal bytes without copying.
+    return buffer.getvalue()
+
+
+def encode_image_to_base64(image_jpeg: bytes) -> str:
+    """Convert JPEG bytes to a base64 string."""
+    return base64.b64encode(image_jpeg).decode("ascii")
 
 
-def analyze_building_with_gpt4o(image_base64: str, api_key: str, budget: str, ai_style: str) -> str | None:
-    """Send image + instructions to OpenAI GPT-4o and return the text answer."""
+@st.cache_data(ttl=300, show_spinner=False)
+def get_image_bucket() -> str | None:
+    """
+    S3 bucket for handing images to OpenAI by URL instead of inline base64.
+    Priority:
+      1) st.secrets["s3"]["bucket"]
+      2) environment variable IMAGE_BUCKET
+    Without a bucket, images are sent inline as a base64 data URL.
+    """
     try:
-        client = openai.OpenAI(api_key=api_key)
+        bucket = st.secrets["s3"]["bucket"]
+        if bucket:
+            return bucket
+    except Exception:
+        pass
+
+    return os.getenv("IMAGE_BUCKET")
+
+
+# upload_fileobj wraps client errors in S3UploadFailedError.
+S3_ERRORS = (BotoCoreError, ClientError, S3UploadFailedError)
+
+
+@st.cache_resource
+def get_s3_client():
+    """Build one S3 client (credentials from the standard AWS chain) and reuse it across reruns."""
+    return boto3.client("s3")
+
+
+def upload_image(image_jpeg: bytes, bucket: str) -> tuple[str, str]:
+    """Upload JPEG bytes to S3; return the object key and a pre-signed GET URL valid for 10 minutes."""
+    s3 = get_s3_client()
+    # Unique per upload, so one session deleting its object never pulls it from under another.
+    key = f"uploads/{uuid.uuid4().hex}.jpg"
+    # BytesIO over bytes shares the buffer until written to, so this does not copy the JPEG.
+    s3.upload_fileobj(io.BytesIO(image_jpeg), bucket, key, ExtraArgs={"ContentType": "image/jpeg"})
+    url = s3.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=IMAGE_URL_TTL
+    )
+    return key, url
 
-        prompt = f"""
-You are a green building materials expert.
 
-1) The user provides an image (blueprint or photo) of a building they plan to build or improve.
-2) Recommend the best materials to build/upgrade this structure with a sustainability focus.
-3) Adjust choices to the user's customization and needs: The user's budget level is {budget} and your tone should be {ai_style}.
-4) Provide specific, actionable recommendations with brief explanations (durability, embodied carbon, insulation value, maintenance, cost tradeoffs).
-5) Where helpful, suggest alternatives by budget tier and note key standards/certifications (e.g., FSC, EPD, Energy Star).
+@contextlib.contextmanager
+def image_url_for(image_jpeg: bytes) -> Iterator[str]:
+    """
+    Yield the URL OpenAI should fetch the image from.
+    With a bucket, OpenAI fetches the image itself and the request skips ~33% base64 overhead;
+    the object is deleted once the block exits so user images are not kept in the bucket.
+    Without a bucket, or if the upload fails, the image is inlined as a base64 data URL.
+    The bucket is only an optimization, so S3 errors never fail the request; a lifecycle rule
+    on uploads/ is the backstop for objects whose delete fails.
+    """
+    bucket = get_image_bucket()
+    uploaded = None
+    if bucket:
+        try:
+            uploaded = upload_image(image_jpeg, bucket)
+        except S3_ERRORS:
+            pass
+    if uploaded is None:
+        yield f"data:image/jpeg;base64,{encode_image_to_base64(image_jpeg)}"
+        return
+
+    key, url = uploaded
+    try:
+        yield url
+    finally:
+        try:
+            get_s3_client().delete_object(Bucket=bucket, Key=key)
+        except S3_ERRORS:
+            pass
+
+
+@st.cache_resource(max_entries=OPENAI_CLIENT_MAX_ENTRIES, ttl=OPENAI_CLIENT_TTL)
+def get_openai_client(api_key: str) -> openai.OpenAI:
+    """
+    Build one pooled HTTP/2 OpenAI client per API key and reuse it across reruns.
+    Bounded in count and lifetime so clients (and keys) for one-off sidebar keys are released.
+    """
+    return openai.OpenAI(
+        api_key=api_key,
+        http_client=openai.DefaultHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=10),
+        ),
+    )
 
-When you are ready, begin your report with the following:
 
-Hi {name}, 
-"""
+@st.cache_resource
+def get_response_cache() -> diskcache.Cache:
+    """Open the on-disk response cache shared by all sessions."""
+    return diskcache.Cache(RESPONSE_CACHE_DIR)
 
+
+def cache_variant(model: str, max_tokens: int, detail: str, max_side: int) -> str:
+    """Model/prompt/image settings that must match for a cached response to be reusable."""
+    return f"{model}:{max_tokens}:{PROMPT_VERSION}:{detail}:{max_side}"
+
+
+def response_cache_key(file_bytes: bytes, budget: str, ai_style: str, name: str, variant: str) -> str:
+    """Deterministic key for a request: uploaded bytes, user choices and model/prompt/image variant."""
+    digest = hashlib.sha256(file_bytes)
+    for part in (budget, ai_style, name, variant):
+        digest.update(b"\x00" + part.encode())
+    return digest.hexdigest()
+
+
+@st.cache_resource
+def load_clip_model() -> SentenceTransformer:
+    """Load the local CLIP model used to embed uploaded images."""
+    return SentenceTransformer(CLIP_MODEL_NAME)
+
+
+def embed_image(clip_model: SentenceTransformer, file_bytes: bytes) -> bytes:
+    """Embed uploaded image bytes with CLIP, decoding only a small copy, as a sqlite-vec blob."""
+    image = Image.open(io.BytesIO(file_bytes))
+    if image.format == "JPEG":
+        image.draft("RGB", CLIP_INPUT_SIZE)
+    image = image.convert("RGB")
+    image.thumbnail(CLIP_INPUT_SIZE, Image.Resampling.BILINEAR)
+    return sqlite_vec.serialize_float32(clip_model.encode(image).tolist())
+
+
+@st.cache_resource
+def get_semantic_cache() -> tuple[sqlite3.Connection, threading.Lock]:
+    """
+    Open the sqlite-vec database holding (embedding, preferences, response) rows.
+    The connection is shared by all session threads, so every use must hold the returned lock.
+    """
+    os.makedirs(os.path.dirname(SEMANTIC_CACHE_PATH), exist_ok=True)
+    db = sqlite3.connect(SEMANTIC_CACHE_PATH, check_same_thread=False)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    db.enable_load_extension(False)
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS semantic_cache (
+            emb BLOB NOT NULL,
+            budget TEXT NOT NULL,
+            style TEXT NOT NULL,
+            name TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """
+    )
+    return db, threading.Lock()
+
+
+def semantic_variant(variant: str) -> str:
+    """Cache variant plus the embedding model, so rows from another CLIP model are never compared."""
+    return f"{variant}:{CLIP_MODEL_NAME}"
+
+
+def lookup_similar_analysis(embedding: bytes, budget: str, ai_style: str, name: str, variant: str) -> str | None:
+    """Return a fresh cached response for a near-identical image with the same preferences."""
+    db, lock = get_semantic_cache()
+    with lock:
+        row = db.execute(
+            """
+            SELECT response, vec_distance_cosine(emb, ?) AS distance
+            FROM semantic_cache
+            WHERE budget = ? AND style = ? AND name = ? AND variant = ? AND created_at > ?
+            ORDER BY distance
+            LIMIT 1
+            """,
+            (embedding, budget, ai_style, name, semantic_variant(variant), time.time() - SEMANTIC_CACHE_TTL),
+        ).fetchone()
+    if row is not None and row[1] < SEMANTIC_MAX_DISTANCE:
+        return row[0]
+    return None
+
+
+def store_similar_analysis(
+    embedding: bytes, budget: str, ai_style: str, name: str, variant: str, response: str
+) -> None:
+    """Record a fresh response in the semantic cache and drop expired rows."""
+    db, lock = get_semantic_cache()
+    now = time.time()
+    with lock, db:
+        db.execute("DELETE FROM semantic_cache WHERE created_at <= ?", (now - SEMANTIC_CACHE_TTL,))
+        db.execute(
+            "INSERT INTO semantic_cache (emb, budget, style, name, variant, response, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (embedding, budget, ai_style, name, semantic_variant(variant), response, now),
+        )
+
+
+def request_analysis(
+    file_bytes: bytes,
+    max_side: int,
+    api_key: str,
+    budget: str,
+    ai_style: str,
+    name: str,
+    detail: str,
+    placeholder: DeltaGenerator,
+) -> str | None:
+    """
+    Call the style's model tier for one request, streaming the answer into `placeholder` as it arrives.
+    Exact repeats are served from the on-disk response cache before any image work; on a miss,
+    a near-duplicate image with the same preferences is served from the semantic cache instead.
+    Errors propagate so that failed calls are never cached.
+    """
+    st.session_state.pop("analysis_usage", None)
+    cache = get_response_cache()
+    model, max_tokens = STYLE_TIERS[ai_style]
+    variant = cache_variant(model, max_tokens, detail, max_side)
+    key = response_cache_key(file_bytes, budget, ai_style, name, variant)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    # The CLIP embedding and the JPEG preparation only depend on the upload, so run the
+    # embedding in a worker thread while this thread prepares the JPEG. Both release the GIL
+    # in their native code (torch / libjpeg). Streamlit calls stay on the script thread.
+    # The semantic cache is only an optimization: any failure there (model download, sqlite
+    # extension loading, a locked or full database, ...) counts as a miss.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        try:
+            embedding_future = pool.submit(embed_image, load_clip_model(), file_bytes)
+        except Exception:
+            embedding_future = None
+        image_jpeg = prepare_image_jpeg(file_bytes, max_side)
+
+    embedding = None
+    if embedding_future is not None:
+        try:
+            embedding = embedding_future.result()
+            similar = lookup_similar_analysis(embedding, budget, ai_style, name, variant)
+        except Exception:
+            similar = None
+        if similar is not None:
+            cache.set(key, similar, expire=RESPONSE_CACHE_TTL)
+            return similar
+
+    client = get_openai_client(api_key)
+
+    with image_url_for(image_jpeg) as image_url:
+        user_prompt = USER_PROMPT_TEMPLATE.substitute(budget=budget, ai_style=ai_style, name=name)
         resp = client.chat.completions.create(
-            model="gpt-4o",
+            model=model,
             messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": prompt},
+                        {"type": "text", "text": user_prompt},
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}",
-                                "detail": "high",
+                                "url": image_url,
+                                "detail": detail,
                             },
                         },
                     ],
-                }
+                },
             ],
-            max_tokens=2000,
+            max_tokens=max_tokens,
             temperature=0.7,
+            prompt_cache_key=PROMPT_CACHE_KEY,
+            stream=True,
+            stream_options={"include_usage": True},
         )
 
-        return resp.choices[0].message.content
+        buf = []
+        for chunk in resp:
+            # With include_usage the final chunk carries token counts and no choices.
+            if chunk.usage is not None:
+                st.session_state.analysis_usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                buf.append(delta)
+                placeholder.markdown("".join(buf))
+
+    result = "".join(buf)
+    if result:
+        cache.set(key, result, expire=RESPONSE_CACHE_TTL)
+        if embedding is not None:
+            try:
+                store_similar_analysis(embedding, budget, ai_style, name, variant, result)
+            except Exception:
+                pass
+    return result
+
+
+def analyze_building_with_gpt4o(
+    file_bytes: bytes,
+    api_key: str,
+    budget: str,
+    ai_style: str,
+    name: str,
+    fast_mode: bool,
+    placeholder: DeltaGenerator,
+) -> str | None:
+    """
+    Send image + instructions to OpenAI (GPT-4o or GPT-4o mini by style) and return the text answer.
+    The answer is streamed into `placeholder` as it arrives.
+    """
+    max_side = FAST_MODE_MAX_SIDE if fast_mode else DEFAULT_MAX_SIDE
+    try:
+        # Opening only parses the header, so the size is known without decoding any pixels.
+        image_size = Image.open(io.BytesIO(file_bytes)).size
+        # Low detail is a flat 85 image tokens instead of several 512px tiles; it is enough for
+        # small images and is always used in fast mode.
+        detail = "low" if fast_mode or max(image_size) <= LOW_DETAIL_MAX_SIDE else "high"
+        return request_analysis(file_bytes, max_side, api_key, budget, ai_style, name, detail, placeholder)
 
     except openai.AuthenticationError:
         st.error("Authentication failed. Please check your OpenAI API key.")
@@ -101,7 +474,7 @@ Hi {name},
 
 # ---------- Sidebar ----------
 with st.sidebar:
-    st.markdown('<h3 class="sub-header">🔧 Configuration</h3>', unsafe_allow_html=True)
+    st.subheader("🔧 Configuration")
 
     # Optional manual override for the key
     user_api_key = st.text_input(
@@ -122,6 +495,12 @@ with st.sidebar:
         st.error("❌ No API key found.")
         st.info("Set it in Streamlit Secrets as openai.api_key or as environment variable OPENAI_API_KEY.")
 
+    fast_mode = st.toggle(
+        "⚡ Fast mode",
+        value=True,
+        help="Send a smaller, low-detail image. Much faster and cheaper; turn off for fine blueprint detail.",
+    )
+
     st.markdown("---")
     st.markdown("### 📋 How to Use")
     st.markdown(
@@ -133,14 +512,23 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### ℹ️ About")
     st.markdown(
-        "This app uses OpenAI GPT-4o to analyze your building image and suggest more sustainable material choices."
+        "This app uses OpenAI GPT-4o and GPT-4o mini to analyze your building image and suggest more sustainable material choices."
     )
 
 
 # ---------- Main UI ----------
-# Detect browser hour for greeting
-hour = st_javascript("new Date().getHours()") or datetime.utcnow().hour
-daytime = "morning" if hour < 12 else "afternoon" if hour < 18 else "evening"
+# Detect browser hour for greeting, once per session.
+# st_javascript returns 0 until the browser has answered. The hour comes back as a string so
+# that a real midnight answer ("0") is truthy and can be told apart; until an answer arrives
+# the UTC hour is used as before.
+if "daytime" not in st.session_state:
+    browser_hour = st_javascript("String(new Date().getHours())")
+    hour = int(browser_hour) if browser_hour else datetime.utcnow().hour
+    daytime = "morning" if hour < 12 else "afternoon" if hour < 18 else "evening"
+    if browser_hour:
+        st.session_state.daytime = daytime
+else:
+    daytime = st.session_state.daytime
 
 st.markdown(
     f"""
@@ -152,70 +540,68 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-st.markdown("<br><hr><br>", unsafe_allow_html=True)
+st.divider()
 
 col1, space, col2, space, col3 = st.columns([2.5, 0.5, 2.5, 0.5, 2])
 
 with col1:
     st.markdown(
-        """
-        <h5>ℹ️ Instructions:</h5>
-        <ul style="line-height: 1.6;">
-            <li><strong>Upload your full-view building image</strong> in the middle column.</li>
-            <li><strong>Fill in preferences</strong> in the third column.</li>
-            <li>Click <strong>Submit</strong> to get green building tips.</li>
-        </ul>
-        """,
-        unsafe_allow_html=True,
+        "##### ℹ️ Instructions:\n"
+        "- **Upload your full-view building image** in the middle column.\n"
+        "- **Fill in preferences** in the third column.\n"
+        "- Click **Submit** to get green building tips."
     )
 
 with col2:
-    st.markdown("<h5>📤 Upload Your File</h5>", unsafe_allow_html=True)
+    st.markdown("##### 📤 Upload Your File")
     uploaded_file = st.file_uploader(
         "Choose an image file", type=["png", "jpg", "jpeg"], help="Upload a clear photo or blueprint."
     )
-    image = None
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Image", use_container_width=True)
+        st.image(make_preview(uploaded_file.getvalue()), caption="Uploaded Image", use_container_width=True)
 
 with col3:
+    name = st.text_input("👤 **Your Name**")
+    budget = st.selectbox("💵 **Budget Level**", ["Basic", "Standard", "Premium"])
+    ai_style = st.selectbox("🤖 **AI Response Style**", ["Casual", "Formal", "Informative", "Normal"])
 
-    st.markdown("<div style='font-size: 1.1rem;'>👤 <strong>Your Name</strong></div>", unsafe_allow_html=True)
-    name = st.text_input(" ", label_visibility="collapsed")
-    
-    st.markdown("<div style='font-size: 1.1rem;'>💵 <strong>Budget Level</strong></div>", unsafe_allow_html=True)
-    budget = st.selectbox(" ", ["Basic", "Standard", "Premium"], label_visibility="collapsed")
-
-    st.markdown("<div style='font-size: 1.1rem;'>🤖 <strong>AI Response Style</strong></div>", unsafe_allow_html=True)
-    ai_style = st.selectbox(" ", ["Casual", "Formal", "Informative", "Normal"], label_visibility="collapsed")
-
+    # The analysis itself runs in the results section below so it can stream there.
+    run_analysis = False
     if st.button("🚀 Submit", type="primary", use_container_width=True):
         if not resolved_api_key:
             st.error("❌ No API key configured.")
-        elif image is None:
+        elif uploaded_file is None:
             st.error("Please upload an image before submitting.")
         else:
-            with st.spinner("Analyzing your building..."):
-                image_base64 = encode_image_to_base64(image)
-                result = analyze_building_with_gpt4o(image_base64, resolved_api_key, budget, ai_style)
-                if result:
-                    st.session_state.analysis_result = result
-                    st.success("Analysis complete! See the results on the bottom.")
-                else:
-                    st.error("Failed to analyze the image. Please try again.")
+            run_analysis = True
+    submit_status = st.empty()
 
 
-st.markdown("<br><hr><br>", unsafe_allow_html=True)
+st.divider()
 
 new_col1, = st.columns(1)
 with new_col1:
-    st.markdown('<h3 class="sub-header">📊 Analysis Results</h3>', unsafe_allow_html=True)
+    st.subheader("📊 Analysis Results")
+    if run_analysis:
+        submit_status.info("Analyzing your building...")
+        stream_placeholder = st.empty()
+        file_bytes = uploaded_file.getvalue()
+        result = analyze_building_with_gpt4o(
+            file_bytes, resolved_api_key, budget, ai_style, name, fast_mode, stream_placeholder
+        )
+        stream_placeholder.empty()
+        if result:
+            st.session_state.analysis_result = result
+            submit_status.success("Analysis complete! See the results on the bottom.")
+        else:
+            submit_status.error("Failed to analyze the image. Please try again.")
+
     if "analysis_result" in st.session_state:
-        st.markdown('<div class="result-section">', unsafe_allow_html=True)
         st.markdown("### 🧱 Building Material Recommendations")
         st.markdown(st.session_state.analysis_result)
-        st.markdown("</div>", unsafe_allow_html=True)
+        if "analysis_usage" in st.session_state:
+            usage = st.session_state.analysis_usage
+            st.caption(f"Tokens used: {usage.prompt_tokens} prompt, {usage.completion_tokens} completion.")
 
         st.download_button(
             label="📥 Download Analysis Report",
@@ -0,0 +1,29 @@
+import hashlib
+
+from prompts import PROMPT_CACHE_KEY, PROMPT_VERSION, SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
+
+# Hash of the prompt text for PROMPT_VERSION. If this test fails, the prompt changed: bump
+# PROMPT_VERSION in prompts.py and update both values here together.
+PINNED_PROMPT_VERSION = "v3"
+PINNED_PROMPT_SHA256 = "4873acb73f03b9d95b9d91f214fb4f5bb33dd9a112af8068e2bb82abdbd8ce77"
+
+
+def test_prompt_text_matches_pinned_hash():
+    digest = hashlib.sha256((SYSTEM_PROMPT + USER_PROMPT_TEMPLATE.template).encode()).hexdigest()
+    assert digest == PINNED_PROMPT_SHA256
+    assert PROMPT_VERSION == PINNED_PROMPT_VERSION
+
+
+def test_prompt_cache_key_follows_version():
+    assert PROMPT_CACHE_KEY == f"gbm-advisor-{PROMPT_VERSION}"
+
+
+def test_system_prompt_has_no_per_request_values():
+    # The system prompt is the cached prefix; per-request values belong in the user message.
+    for field in ("$budget", "$ai_style", "$name", "{"):
+        assert field not in SYSTEM_PROMPT
+
+
+def test_user_prompt_substitution():
+    prompt = USER_PROMPT_TEMPLATE.substitute(budget="Basic", ai_style="Casual", name="Sam")
+    assert prompt == "Budget: Basic\nTone: Casual\nGreet as: Hi Sam,"